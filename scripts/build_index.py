@@ -0,0 +1,153 @@
+"""
+Script: build_index.py
+
+Exports the pooled encoder embeddings of the harmful rows of the prepared datasets into a persistent, memory-mapped approximate nearest neighbour index, used by "predict.py" to instantly look up variations of already-banned content.
+
+The match threshold is calibrated on the similarity of non-harmful texts to the index, and saved with it. The build time and memory footprint of the index are reported, along with the query latency and recall of held-out harmful texts against exact search, followed by a synthetic benchmark at 100k+ vectors to show how the index scales.
+
+**Note**: Before running this script, make sure to run 'prepare_datasets.py' and 'train.py'.
+"""
+
+from dataclasses import replace
+from time import perf_counter
+
+import numpy
+import pandas
+import torch
+from lib import arguments, filepaths, index, utils
+from loguru import logger
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+# Number of harmful texts held out of an evaluation index and used as queries to measure its latency and recall
+HOLDOUT_SAMPLES: int = 1000
+
+# Number of neighbours compared against exact search when measuring the recall
+RECALL_K: int = 10
+
+
+@logger.catch  # Add pretty exceptions
+def main() -> None:
+    # Get the command line arguments
+    args = arguments.get_build_index_arguments()
+
+    # Initialize logger with a timestamped log file
+    utils.create_timestamped_log_file(__file__, filepaths.logs)
+
+    # Collect the rows of every prepared dataset, without duplicates
+    frames: list[pandas.DataFrame] = []
+    for dataset in ("BAN-PL_1.csv", "BAN-PL_2.csv"):
+        df: pandas.DataFrame = pandas.read_csv(filepaths.datasets / dataset)  # type: ignore
+        df = df[["text", "labels"]].dropna()  # type: ignore
+        df["dataset"] = dataset
+        frames.append(df)
+    rows: pandas.DataFrame = pandas.concat(frames).drop_duplicates(subset="text")
+
+    # Index the harmful rows (labels == 1), calibrate on a sample of the non-harmful rows (labels == 0)
+    harmful: pandas.DataFrame = (
+        rows.loc[rows["labels"] == 1, ["text", "dataset"]].reset_index(drop=True)  # type: ignore
+    )
+    non_harmful: pandas.DataFrame = rows.loc[rows["labels"] == 0]  # type: ignore
+    non_harmful = non_harmful.sample(
+        n=min(args.negatives, len(non_harmful)), random_state=42
+    )
+    logger.info(
+        f"Collected {len(harmful)} unique harmful texts and {len(non_harmful)} non-harmful texts for calibration",
+    )
+
+    # Load the fine-tuned tokenizer and model
+    device: str = "cuda" if torch.cuda.is_available() else "cpu"
+    tokenizer = AutoTokenizer.from_pretrained(filepaths.models)
+    model = AutoModelForSequenceClassification.from_pretrained(filepaths.models).to(
+        device
+    )
+
+    # Compute the embeddings
+    logger.info("Computing the embeddings...")
+    start: float = perf_counter()
+    embeddings: numpy.ndarray = index.embed_texts(
+        harmful["text"].tolist(),
+        tokenizer=tokenizer,
+        model=model,
+        device=device,
+        batch_size=args.batch_size,
+    )
+    negatives: numpy.ndarray = index.embed_texts(
+        non_harmful["text"].tolist(),
+        tokenizer=tokenizer,
+        model=model,
+        device=device,
+        batch_size=args.batch_size,
+    )
+    logger.info(f"Computed the embeddings, took {round(perf_counter() - start, 2)}s")
+
+    # Measure the latency and recall on real embeddings: build an evaluation index without a held-out sample, then query it with that sample
+    held_out: numpy.ndarray = numpy.zeros(len(embeddings), dtype=bool)
+    held_out[
+        numpy.random.default_rng(42).choice(
+            len(embeddings),
+            size=min(HOLDOUT_SAMPLES, len(embeddings) // 2),
+            replace=False,
+        )
+    ] = True
+    if not held_out.any():
+        logger.warning(
+            f"Skipping the held-out search, {len(embeddings)} harmful text(s) are too few to hold any out",
+        )
+    else:
+        evaluation_index, evaluation_order = index.build_index(embeddings[~held_out])
+        held_out_results: dict[str, float] = index.measure(
+            evaluation_index,
+            evaluation_order,
+            embeddings=embeddings[~held_out],
+            queries=embeddings[held_out],
+            k=RECALL_K,
+        )
+        # "predict.py" searches one text at a time, so the single-query latency is what it pays
+        logger.info(
+            f"Held-out search of {held_out.sum()} queries: {round(held_out_results['batched_query_latency_ms'], 4)}ms per query batched, {round(held_out_results['single_query_latency_ms'], 4)}ms per single query, recall@{RECALL_K} {round(held_out_results['recall'], 4)}",
+        )
+
+    # Build the index, keeping the texts aligned with the reordered vectors
+    start = perf_counter()
+    harmful_index, order = index.build_index(embeddings)
+    harmful_index = replace(
+        harmful_index, texts=harmful.iloc[order].reset_index(drop=True)
+    )
+    logger.info(
+        f"Built the index of {len(embeddings)} vectors, took {round(perf_counter() - start, 2)}s, footprint {round(index.footprint(harmful_index) / 2**20, 2)} MiB",
+    )
+
+    # Choose the threshold so that only the requested fraction of the non-harmful texts would match
+    threshold, scores = index.calibrate_threshold(
+        harmful_index, negatives, false_match_rate=args.false_match_rate
+    )
+    logger.info(
+        "Similarity of non-harmful texts to the index: "
+        + ", ".join(
+            f"p{q}={round(float(numpy.percentile(scores, q)), 4)}"
+            for q in (50, 90, 95, 99)
+        ),
+    )
+    logger.info(
+        f"Match threshold: {round(threshold, 4)} (false match rate {args.false_match_rate})",
+    )
+    harmful_index = replace(harmful_index, threshold=threshold)
+
+    index.save_index(harmful_index, filepaths.indexes / "harmful")
+    logger.info(f"Saved the index to '{filepaths.indexes / 'harmful'}'")
+
+    # Benchmark the index at a larger scale (synthetic, so only the latency and footprint are meaningful)
+    if args.benchmark:
+        logger.info(f"Benchmarking the index with {args.benchmark} vectors...")
+        results: dict[str, float] = index.benchmark(
+            n_vectors=args.benchmark,
+            dim=embeddings.shape[1],
+        )
+        for key, value in results.items():
+            logger.info(f"{key}: {round(value, 4)}")
+
+    logger.success("All tasks successfully completed")
+
+
+if __name__ == "__main__":
+    main()
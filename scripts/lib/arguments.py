@@ -13,6 +13,8 @@ from loguru import logger as _logger
 __all__: list[str] = [
     # VSCode: Sort lines in descending order
     "get_train_arguments",
+    "get_prune_arguments",
+    "get_build_index_arguments",
 ]
 
 
@@ -75,3 +77,174 @@ def get_train_arguments() -> _argparse.Namespace:
     _configure_logging_level(args.verbose)
 
     return args
+
+
+def get_build_index_arguments() -> _argparse.Namespace:
+    """
+    Get the arguments from the command line for building the embedding index of known-harmful content.
+
+    If the verbose flag is not provided, set log level to "INFO", otherwise, keep it as "DEBUG" (default).
+
+    Raises:
+        ValueError: If the batch size or number of non-harmful texts is not positive, the false match rate is not in the (0.0, 1.0) range, or the benchmark size is negative.
+
+    Returns:
+        Namespace: Namespace containing the parsed arguments.
+    """
+    # Initialize argument parser with description and arguments
+    parser: _argparse.ArgumentParser = _argparse.ArgumentParser(
+        description="build the embedding index of known-harmful content"
+    )
+
+    # Get optional batch size from the command line (e.g., --batch-size 128)
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        help="number of texts per forward pass when computing the embeddings",
+        default=64,
+    )
+
+    # Get optional false match rate from the command line (e.g., --false-match-rate 0.001)
+    parser.add_argument(
+        "--false-match-rate",
+        type=float,
+        help="fraction of non-harmful texts allowed to match the index, used to calibrate the match threshold",
+        default=0.01,
+    )
+
+    # Get optional number of non-harmful texts from the command line (e.g., --negatives 5000)
+    parser.add_argument(
+        "--negatives",
+        type=int,
+        help="number of non-harmful texts used to calibrate the match threshold",
+        default=2000,
+    )
+
+    # Get optional benchmark size from the command line (e.g., --benchmark 200000)
+    parser.add_argument(
+        "--benchmark",
+        type=int,
+        help="number of synthetic vectors to benchmark the index with (0 to skip)",
+        default=100_000,
+    )
+
+    # Get optional verbose flag from the command line (e.g., --verbose)
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="flag to enable verbose logging",
+        default=False,
+    )
+
+    # Parse the arguments
+    args: _argparse.Namespace = parser.parse_args()
+
+    # Raise if the batch size or number of non-harmful texts is not positive, the false match rate is not in the (0.0, 1.0) range, or the benchmark size is negative
+    if args.batch_size <= 0:
+        raise ValueError(
+            f"Batch size must be positive: {args.batch_size}",
+        )
+    if args.negatives <= 0:
+        raise ValueError(
+            f"Number of non-harmful texts must be positive: {args.negatives}",
+        )
+    if not 0.0 < args.false_match_rate < 1.0:
+        raise ValueError(
+            f"False match rate must be in the (0.0, 1.0) range: {args.false_match_rate}",
+        )
+    if args.benchmark < 0:
+        raise ValueError(
+            f"Benchmark size must not be negative: {args.benchmark}",
+        )
+
+    # If the verbose flag is not provided, set log level to INFO, otherwise, keep it as DEBUG (default)
+    _configure_logging_level(args.verbose)
+
+    return args
+
+
+def get_prune_arguments() -> _argparse.Namespace:
+    """
+    Get the arguments from the command line for pruning the fine-tuned model.
+
+    If the verbose flag is not provided, set log level to "INFO", otherwise, keep it as "DEBUG" (default).
+
+    Raises:
+        ValueError: If a pruning level is not in the [0.0, 1.0) range, or a count is out of range.
+
+    Returns:
+        Namespace: Namespace containing the parsed arguments.
+    """
+    # Initialize argument parser with description and arguments
+    parser: _argparse.ArgumentParser = _argparse.ArgumentParser(
+        description="prune the attention heads and FFN neurons of the fine-tuned model"
+    )
+
+    # Get optional pruning levels from the command line (e.g., --levels 0.25 0.5)
+    parser.add_argument(
+        "-l",
+        "--levels",
+        type=float,
+        nargs="+",
+        help="fractions of the heads and FFN neurons to remove, one pruned model is saved per level",
+        default=[0.0, 0.25, 0.5, 0.75],
+    )
+
+    # Get optional latency budget from the command line (e.g., --max-latency 20)
+    parser.add_argument(
+        "--max-latency",
+        type=float,
+        help="latency budget per text in milliseconds, used to recommend the most accurate level within it",
+        default=None,
+    )
+
+    # Get optional number of fine-tuning steps from the command line (e.g., --finetune-steps 100)
+    parser.add_argument(
+        "--finetune-steps",
+        type=int,
+        help="number of fine-tuning steps to recover the accuracy after pruning (0 to skip)",
+        default=0,
+    )
+
+    # Get optional number of validation samples from the command line (e.g., --samples 2000)
+    parser.add_argument(
+        "-s",
+        "--samples",
+        type=int,
+        help="number of validation texts, split evenly between scoring the importance and evaluating the F1 score",
+        default=1000,
+    )
+
+    # Get optional verbose flag from the command line (e.g., --verbose)
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="flag to enable verbose logging",
+        default=False,
+    )
+
+    # Parse the arguments
+    args: _argparse.Namespace = parser.parse_args()
+
+    # Raise if a pruning level is not in the [0.0, 1.0) range, or a count is out of range
+    for level in args.levels:
+        if not 0.0 <= level < 1.0:
+            raise ValueError(
+                f"Pruning level must be in the [0.0, 1.0) range: {level}",
+            )
+    if args.finetune_steps < 0:
+        raise ValueError(
+            f"Number of fine-tuning steps must not be negative: {args.finetune_steps}",
+        )
+    if args.samples < 2:
+        raise ValueError(
+            f"Number of validation samples must be at least 2 (one to score, one to evaluate): {args.samples}",
+        )
+
+    # If the verbose flag is not provided, set log level to INFO, otherwise, keep it as DEBUG (default)
+    _configure_logging_level(args.verbose)
+
+    return args
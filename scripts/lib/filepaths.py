@@ -11,6 +11,7 @@ __all__: list[str] = [
     # VSCode: Sort lines in descending order
     "configs",
     "datasets",
+    "indexes",
     "logs",
     "models",
     "modules",
@@ -31,6 +32,9 @@ configs: _Path = root / "configs"
 # Path: root/datasets/
 datasets: _Path = root / "datasets"
 
+# Path: root/indexes/
+indexes: _Path = root / "indexes"
+
 # Path: root/logs/
 logs: _Path = root / "logs"
 
@@ -42,5 +46,5 @@ modules: _Path = root / "modules"
 
 # ------------------------------------------------------------------------------
 # Recursively create the directories if they don't exist
-for directory in (configs, datasets, logs, models, modules):
+for directory in (configs, datasets, indexes, logs, models, modules):
     directory.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,671 @@
+"""
+Module: index.py
+
+Handles the persistent, memory-mapped approximate nearest neighbour (ANN) index of pooled encoder embeddings.
+
+The index is an inverted file (IVF): the embeddings are clustered with k-means, stored contiguously on disk grouped by cluster, and only the `n_probe` clusters closest to a query are scanned at search time.
+"""
+
+from dataclasses import dataclass as _dataclass
+from pathlib import Path as _Path
+from time import perf_counter as _perf_counter
+from typing import Any as _Any
+
+import numpy as _np
+import pandas as _pd
+import torch as _torch
+from loguru import logger as _logger
+
+# Public objects
+__all__: list[str] = [
+    # VSCode: Sort lines in descending order
+    "EmbeddingIndex",
+    "benchmark",
+    "build_index",
+    "calibrate_threshold",
+    "embed_texts",
+    "footprint",
+    "load_index",
+    "measure",
+    "pool",
+    "save_index",
+    "search",
+]
+
+# File names of the index components, stored inside the index directory
+_VECTORS_FILE: str = "vectors.npy"
+_CENTROIDS_FILE: str = "centroids.npy"
+_OFFSETS_FILE: str = "offsets.npy"
+_THRESHOLD_FILE: str = "threshold.npy"
+_TEXTS_FILE: str = "texts.csv"
+
+
+@_dataclass(frozen=True)
+class EmbeddingIndex:
+    """
+    Inverted file index of L2-normalized embeddings, where the dot product equals the cosine similarity.
+
+    Attributes:
+        vectors (np.ndarray): Embeddings of shape (n_vectors, dim), grouped by cluster (memory-mapped when loaded from disk).
+        centroids (np.ndarray): Cluster centroids of shape (n_lists, dim).
+        offsets (np.ndarray): Start of each cluster in `vectors`, of shape (n_lists + 1,), so that cluster `i` is `vectors[offsets[i]:offsets[i + 1]]`.
+        texts (pd.DataFrame | None): Source texts (and their origin) aligned with `vectors`, or None if not available (e.g., synthetic benchmark).
+        threshold (float | None): Minimum cosine similarity to consider a query a match, from `calibrate_threshold`, or None if not calibrated.
+    """
+
+    vectors: _np.ndarray
+    centroids: _np.ndarray
+    offsets: _np.ndarray
+    texts: _pd.DataFrame | None = None
+    threshold: float | None = None
+
+
+def _normalize(
+    matrix: _np.ndarray,
+) -> _np.ndarray:
+    """
+    L2-normalize the rows of a matrix, so that the dot product equals the cosine similarity.
+
+    Args:
+        matrix (np.ndarray): Matrix of shape (n, dim).
+
+    Returns:
+        np.ndarray: Row-normalized float32 matrix of shape (n, dim), the input itself if it is already normalized.
+    """
+    matrix = matrix.astype(_np.float32, copy=False)
+    # "einsum" avoids the full-size temporary of "np.linalg.norm", which matters for large matrices
+    norms: _np.ndarray = _np.sqrt(_np.einsum("ij,ij->i", matrix, matrix))[:, None]
+    if _np.allclose(norms, 1.0, atol=1e-4):
+        return matrix
+    return matrix / _np.maximum(norms, 1e-12)
+
+
+def embed_texts(
+    texts: list[str],
+    tokenizer: _Any,
+    model: _Any,
+    device: str,
+    batch_size: int = 64,
+) -> _np.ndarray:
+    """
+    Compute the mean-pooled, L2-normalized last hidden state of the encoder for each text.
+
+    Args:
+        texts (list[str]): Texts to embed.
+        tokenizer (Any): Hugging Face tokenizer matching the model.
+        model (Any): Hugging Face sequence classification model (e.g., the fine-tuned DistilBERT saved by "train.py").
+        device (str): Device to run the model on (e.g., "cuda" or "cpu").
+        batch_size (int): Number of texts per forward pass.
+
+    Returns:
+        np.ndarray: Embeddings of shape (len(texts), hidden_size).
+    """
+    model.eval()
+    batches: list[_np.ndarray] = []
+    for start in range(0, len(texts), batch_size):
+        inputs = tokenizer(
+            texts[start : start + batch_size],
+            return_tensors="pt",
+            truncation=True,
+            padding=True,
+        )
+        inputs = {k: v.to(device) for k, v in inputs.items()}
+        with _torch.no_grad():
+            outputs = model(**inputs, output_hidden_states=True)
+        batches.append(pool(outputs.hidden_states[-1], inputs["attention_mask"]))
+        _logger.debug(
+            f"Embedded {min(start + batch_size, len(texts))}/{len(texts)} texts",
+        )
+    return _np.concatenate(batches)
+
+
+def pool(
+    hidden_state: _torch.Tensor,
+    attention_mask: _torch.Tensor,
+) -> _np.ndarray:
+    """
+    Mean-pool the hidden state over the non-padding tokens and L2-normalize the result.
+
+    Args:
+        hidden_state (Tensor): Last hidden state of shape (batch, seq_len, hidden_size).
+        attention_mask (Tensor): Attention mask of shape (batch, seq_len).
+
+    Returns:
+        np.ndarray: Embeddings of shape (batch, hidden_size).
+    """
+    mask: _torch.Tensor = attention_mask.unsqueeze(-1).to(hidden_state.dtype)
+    summed: _torch.Tensor = (hidden_state * mask).sum(dim=1)
+    pooled: _torch.Tensor = summed / mask.sum(dim=1).clamp(min=1)
+    return _normalize(pooled.float().cpu().numpy())
+
+
+def build_index(
+    embeddings: _np.ndarray,
+    n_lists: int | None = None,
+    n_iter: int = 10,
+    seed: int = 42,
+) -> tuple[EmbeddingIndex, _np.ndarray]:
+    """
+    Cluster the embeddings with spherical k-means and group them by cluster.
+
+    Args:
+        embeddings (np.ndarray): Embeddings of shape (n_vectors, dim).
+        n_lists (int | None): Number of clusters. If None, use roughly the square root of the number of vectors.
+        n_iter (int): Number of k-means iterations.
+        seed (int): Random seed for the initial centroids.
+
+    Raises:
+        ValueError: If there are no embeddings to index.
+
+    Returns:
+        tuple[EmbeddingIndex, np.ndarray]: The index (held in memory) and the permutation that maps each index row to its row in `embeddings`.
+    """
+    if len(embeddings) == 0:
+        raise ValueError(
+            "Cannot build an index without any embeddings",
+        )
+
+    start: float = _perf_counter()
+    embeddings = _normalize(embeddings)
+    if n_lists is None:
+        n_lists = max(1, int(_np.sqrt(len(embeddings))))
+    n_lists = min(n_lists, len(embeddings))
+
+    # Initialize the centroids with random embeddings
+    rng: _np.random.Generator = _np.random.default_rng(seed)
+    centroids: _np.ndarray = embeddings[
+        rng.choice(len(embeddings), size=n_lists, replace=False)
+    ].copy()
+
+    # Spherical k-means: assign by the highest cosine similarity, re-center, re-normalize
+    assignments: _np.ndarray = _np.zeros(len(embeddings), dtype=_np.int64)
+    for _ in range(n_iter):
+        assignments = _assign(embeddings, centroids)
+        # Sum the members of each cluster as contiguous segments (much faster than "np.add.at")
+        members: _np.ndarray = _np.argsort(assignments, kind="stable")
+        counts: _np.ndarray = _np.bincount(assignments, minlength=n_lists)
+        # Keep the previous centroid for empty clusters
+        non_empty: _np.ndarray = counts > 0
+        starts: _np.ndarray = (_np.cumsum(counts) - counts)[non_empty]
+        centroids[non_empty] = _normalize(
+            _np.add.reduceat(embeddings[members], starts, axis=0)
+        )
+    assignments = _assign(embeddings, centroids)
+
+    # Store the vectors contiguously, grouped by cluster
+    order: _np.ndarray = _np.argsort(assignments, kind="stable")
+    offsets: _np.ndarray = _np.zeros(n_lists + 1, dtype=_np.int64)
+    offsets[1:] = _np.cumsum(_np.bincount(assignments, minlength=n_lists))
+
+    _logger.debug(
+        f"Built index of {len(embeddings)} vectors in {n_lists} lists, took {round(_perf_counter() - start, 2)}s",
+    )
+    return EmbeddingIndex(embeddings[order], centroids, offsets), order
+
+
+def _assign(
+    embeddings: _np.ndarray,
+    centroids: _np.ndarray,
+    chunk_size: int = 8192,
+) -> _np.ndarray:
+    """
+    Assign each embedding to its most similar centroid, in chunks to bound the memory usage.
+
+    Args:
+        embeddings (np.ndarray): Embeddings of shape (n_vectors, dim).
+        centroids (np.ndarray): Centroids of shape (n_lists, dim).
+        chunk_size (int): Number of embeddings per chunk.
+
+    Returns:
+        np.ndarray: Cluster index of each embedding, of shape (n_vectors,).
+    """
+    return _np.concatenate(
+        [
+            _np.argmax(embeddings[start : start + chunk_size] @ centroids.T, axis=1)
+            for start in range(0, len(embeddings), chunk_size)
+        ]
+    )
+
+
+def save_index(
+    index: EmbeddingIndex,
+    output_directory: _Path,
+) -> None:
+    """
+    Save the index to disk, so that it can be memory-mapped by `load_index`.
+
+    Args:
+        index (EmbeddingIndex): Index to save.
+        output_directory (Path): Path to the output directory (e.g., "~/indexes/harmful").
+    """
+    output_directory.mkdir(parents=True, exist_ok=True)
+
+    _np.save(output_directory / _VECTORS_FILE, index.vectors.astype(_np.float32))
+    _np.save(output_directory / _CENTROIDS_FILE, index.centroids)
+    _np.save(output_directory / _OFFSETS_FILE, index.offsets)
+    if index.threshold is not None:
+        _np.save(output_directory / _THRESHOLD_FILE, _np.float32(index.threshold))
+    if index.texts is not None:
+        index.texts.to_csv(output_directory / _TEXTS_FILE, index=False)
+
+    _logger.debug(
+        f"Saved index to '{output_directory}'",
+    )
+
+
+def load_index(
+    input_directory: _Path,
+) -> EmbeddingIndex:
+    """
+    Load the index from disk, memory-mapping the vectors (read-only).
+
+    Args:
+        input_directory (Path): Path to the index directory (e.g., "~/indexes/harmful").
+
+    Raises:
+        FileNotFoundError: If the index directory does not exist.
+
+    Returns:
+        EmbeddingIndex: The loaded index.
+    """
+    if not (input_directory / _VECTORS_FILE).exists():
+        raise FileNotFoundError(
+            f"Index '{input_directory}' does not exist, try running 'python3 scripts/build_index.py'",
+        )
+
+    texts_path: _Path = input_directory / _TEXTS_FILE
+    threshold_path: _Path = input_directory / _THRESHOLD_FILE
+    return EmbeddingIndex(
+        vectors=_np.load(input_directory / _VECTORS_FILE, mmap_mode="r"),
+        centroids=_np.load(input_directory / _CENTROIDS_FILE),
+        offsets=_np.load(input_directory / _OFFSETS_FILE),
+        texts=_pd.read_csv(texts_path) if texts_path.exists() else None,  # type: ignore
+        threshold=float(_np.load(threshold_path)) if threshold_path.exists() else None,
+    )
+
+
+def search(
+    index: EmbeddingIndex,
+    queries: _np.ndarray,
+    k: int = 1,
+    n_probe: int = 8,
+) -> tuple[_np.ndarray, _np.ndarray]:
+    """
+    Find the `k` most similar indexed vectors for a batch of queries.
+
+    Each cluster is scanned once per batch with a single matrix multiplication against all the queries that probe it.
+
+    Args:
+        index (EmbeddingIndex): Index to search.
+        queries (np.ndarray): Query embeddings of shape (n_queries, dim).
+        k (int): Number of neighbours per query.
+        n_probe (int): Number of closest clusters to scan per query. Higher is more accurate, but slower.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Cosine similarities and index rows, both of shape (n_queries, k), sorted by descending similarity. Missing neighbours have a similarity of -inf and a row of -1.
+    """
+    queries = _normalize(_np.atleast_2d(queries))
+    n_queries: int = len(queries)
+    n_probe = min(n_probe, len(index.centroids))
+
+    # Select the closest clusters for each query
+    probes: _np.ndarray = _np.argpartition(
+        -(queries @ index.centroids.T), n_probe - 1, axis=1
+    )[:, :n_probe]
+
+    best_scores: _np.ndarray = _np.full((n_queries, k), -_np.inf, dtype=_np.float32)
+    best_rows: _np.ndarray = _np.full((n_queries, k), -1, dtype=_np.int64)
+    for cluster in _np.unique(probes):
+        start, end = int(index.offsets[cluster]), int(index.offsets[cluster + 1])
+        if start == end:
+            continue
+        query_rows: _np.ndarray = _np.flatnonzero((probes == cluster).any(axis=1))
+
+        # Score every vector in the cluster against every query probing it
+        scores: _np.ndarray = queries[query_rows] @ _np.asarray(
+            index.vectors[start:end]
+        ).T
+        rows: _np.ndarray = _np.broadcast_to(
+            _np.arange(start, end), scores.shape
+        )
+
+        # Merge with the best neighbours found so far
+        merged_scores: _np.ndarray = _np.concatenate(
+            [best_scores[query_rows], scores], axis=1
+        )
+        merged_rows: _np.ndarray = _np.concatenate(
+            [best_rows[query_rows], rows], axis=1
+        )
+        top: _np.ndarray = _np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+        best_scores[query_rows] = _np.take_along_axis(merged_scores, top, axis=1)
+        best_rows[query_rows] = _np.take_along_axis(merged_rows, top, axis=1)
+
+    # Sort the neighbours by descending similarity
+    order: _np.ndarray = _np.argsort(-best_scores, axis=1)
+    return (
+        _np.take_along_axis(best_scores, order, axis=1),
+        _np.take_along_axis(best_rows, order, axis=1),
+    )
+
+
+def calibrate_threshold(
+    index: EmbeddingIndex,
+    negatives: _np.ndarray,
+    false_match_rate: float = 0.01,
+    n_probe: int = 8,
+) -> tuple[float, _np.ndarray]:
+    """
+    Choose the match threshold from the similarity of non-harmful embeddings to their closest indexed vector.
+
+    Mean-pooled hidden states are anisotropic, so even unrelated texts can have a cosine similarity above 0.9. Calibrating on known negatives bounds how often a non-harmful text is reported as a match.
+
+    Args:
+        index (EmbeddingIndex): Index to calibrate.
+        negatives (np.ndarray): Embeddings of non-harmful texts, of shape (n_negatives, dim).
+        false_match_rate (float): Fraction of the negatives allowed to match (0.0 - 1.0).
+        n_probe (int): Number of clusters to scan per query, as used at prediction time.
+
+    Raises:
+        ValueError: If the false match rate is not in the (0.0, 1.0) range, or no negative has any candidate.
+
+    Returns:
+        tuple[float, np.ndarray]: The threshold and the best similarity of every negative (for reporting the distribution).
+    """
+    if not 0.0 < false_match_rate < 1.0:
+        raise ValueError(
+            f"The false match rate must be in the (0.0, 1.0) range: {false_match_rate}",
+        )
+
+    scores, _ = search(index, negatives, k=1, n_probe=n_probe)
+    best: _np.ndarray = scores[:, 0][_np.isfinite(scores[:, 0])]
+    if len(best) == 0:
+        raise ValueError(
+            "Cannot calibrate the threshold, no negative has any candidate in the index",
+        )
+    return float(_np.quantile(best, 1.0 - false_match_rate)), best
+
+
+def measure(
+    index: EmbeddingIndex,
+    order: _np.ndarray,
+    embeddings: _np.ndarray,
+    queries: _np.ndarray,
+    k: int = 10,
+    n_probe: int = 8,
+    single_queries: int = 100,
+    max_elements: int = 2**24,
+) -> dict[str, float]:
+    """
+    Measure the batched and single-query search latency, and the recall@k against exact (brute-force) search.
+
+    The single-query latency is what "predict.py" pays, since it searches one text at a time.
+
+    Args:
+        index (EmbeddingIndex): Index to measure, built from `embeddings`.
+        order (np.ndarray): Permutation returned by `build_index`, mapping each index row to its row in `embeddings`.
+        embeddings (np.ndarray): Embeddings the index was built from, of shape (n_vectors, dim).
+        queries (np.ndarray): Query embeddings of shape (n_queries, dim), ideally not part of the index.
+        k (int): Number of neighbours per query.
+        n_probe (int): Number of clusters to scan per query.
+        single_queries (int): Number of queries searched one by one (with k=1) to measure the single-query latency.
+        max_elements (int): Maximum size of the brute-force similarity matrix of a chunk of queries, to bound the memory usage (about 12 bytes per element).
+
+    Raises:
+        ValueError: If there are no queries.
+
+    Returns:
+        dict[str, float]: Batch latency (s), batched and single-query latency per query (ms), and recall@k.
+    """
+    if len(queries) == 0:
+        raise ValueError(
+            "Cannot measure the search without any queries",
+        )
+
+    embeddings = _normalize(embeddings)
+    queries = _normalize(queries)
+
+    start: float = _perf_counter()
+    _, rows = search(index, queries, k=k, n_probe=n_probe)
+    latency: float = _perf_counter() - start
+
+    start = _perf_counter()
+    for query in queries[:single_queries]:
+        search(index, query[None], k=1, n_probe=n_probe)
+    single_latency: float = (_perf_counter() - start) / len(queries[:single_queries])
+
+    # Map the index rows back to the rows in "embeddings", keeping -1 for missing neighbours
+    found: _np.ndarray = _np.where(rows >= 0, order[rows], -1)
+
+    # Size the chunks of queries so that their similarity matrix against all the embeddings stays bounded
+    chunk_size: int = max(1, max_elements // len(embeddings))
+    k_exact: int = min(k, len(embeddings))
+    hits: int = 0
+    for start_row in range(0, len(queries), chunk_size):
+        similarities: _np.ndarray = (
+            queries[start_row : start_row + chunk_size] @ embeddings.T
+        )
+        _np.negative(similarities, out=similarities)
+        exact: _np.ndarray = _np.argpartition(similarities, k_exact - 1, axis=1)[
+            :, :k_exact
+        ]
+        del similarities
+        hits += sum(
+            len(set(a) & set(b))
+            for a, b in zip(found[start_row : start_row + chunk_size], exact)
+        )
+
+    return {
+        "batch_latency_s": latency,
+        "batched_query_latency_ms": 1000 * latency / len(queries),
+        "single_query_latency_ms": 1000 * single_latency,
+        "recall": hits / (k_exact * len(queries)),
+    }
+
+
+def footprint(
+    index: EmbeddingIndex,
+) -> int:
+    """
+    Get the size of the index arrays in bytes (excluding the source texts).
+
+    Args:
+        index (EmbeddingIndex): Index to measure.
+
+    Returns:
+        int: Size of the index in bytes.
+    """
+    return index.vectors.nbytes + index.centroids.nbytes + index.offsets.nbytes
+
+
+def benchmark(
+    n_vectors: int = 100_000,
+    dim: int = 768,
+    n_queries: int = 1_000,
+    k: int = 1,
+    n_probe: int = 8,
+    seed: int = 42,
+) -> dict[str, float]:
+    """
+    Measure the build time, query latency, recall and memory footprint of the index on synthetic clustered embeddings.
+
+    The queries are noisy copies of indexed vectors around well-separated topics, so the recall is optimistic by construction. This benchmark only shows how the index scales, use `measure` with held-out real embeddings for the recall.
+
+    Args:
+        n_vectors (int): Number of indexed vectors.
+        dim (int): Dimension of the vectors (768 for DistilBERT).
+        n_queries (int): Number of queries, searched as a single batch.
+        k (int): Number of neighbours per query.
+        n_probe (int): Number of clusters to scan per query.
+        seed (int): Random seed.
+
+    Returns:
+        dict[str, float]: Build time (s), batch latency (s), batched and single-query latency per query (ms), recall@k against exact search, and footprint (MiB).
+    """
+    rng: _np.random.Generator = _np.random.default_rng(seed)
+
+    # Synthetic embeddings around random topics, with queries being noisy copies of indexed vectors (i.e., "variations of banned content")
+    # The noise is added in chunks, so that only one full-size matrix is allocated
+    topics: _np.ndarray = rng.standard_normal((256, dim), dtype=_np.float32)
+    embeddings: _np.ndarray = topics[rng.integers(0, len(topics), n_vectors)]
+    for start_row in range(0, n_vectors, 8192):
+        chunk: _np.ndarray = embeddings[start_row : start_row + 8192]
+        chunk += 0.5 * rng.standard_normal(chunk.shape, dtype=_np.float32)
+        chunk /= _np.sqrt(_np.einsum("ij,ij->i", chunk, chunk))[:, None]
+    queries: _np.ndarray = _normalize(
+        embeddings[rng.integers(0, n_vectors, n_queries)]
+        + 0.05 * rng.standard_normal((n_queries, dim), dtype=_np.float32)
+    )
+
+    start: float = _perf_counter()
+    index, order = build_index(embeddings, seed=seed)
+    build_time: float = _perf_counter() - start
+
+    return {
+        "build_time_s": build_time,
+        **measure(index, order, embeddings, queries, k=k, n_probe=n_probe),
+        "footprint_mib": footprint(index) / 2**20,
+    }
+
+
+# If this file is run directly, run the tests
+if __name__ == "__main__":
+    import sys as _sys
+    import unittest as _unittest
+    from dataclasses import replace as _replace
+    from tempfile import TemporaryDirectory as _TemporaryDirectory
+
+    # Set the log level to INFO (comment out these lines to see DEBUG level messages)
+    _logger.remove()
+    _logger.add(_sys.stdout, level="INFO")
+
+    class TestIndex(_unittest.TestCase):
+        def setUp(
+            self,
+        ) -> None:
+            """
+            Build a small index of random embeddings.
+            """
+            rng: _np.random.Generator = _np.random.default_rng(42)
+            self.embeddings: _np.ndarray = _normalize(
+                rng.standard_normal((500, 16)).astype(_np.float32)
+            )
+            self.queries: _np.ndarray = _normalize(
+                rng.standard_normal((20, 16)).astype(_np.float32)
+            )
+            self.index, self.order = build_index(self.embeddings, n_lists=10)
+
+        def test_search_matches_brute_force(
+            self,
+        ) -> None:
+            """
+            Ensure that probing every cluster returns the exact top-k, sorted by descending similarity.
+            """
+            # Log the name of the test
+            _logger.info(
+                "Running test: test_search_matches_brute_force",
+            )
+
+            k: int = 5
+            scores, rows = search(
+                self.index, self.queries, k=k, n_probe=len(self.index.centroids)
+            )
+
+            exact_scores: _np.ndarray = self.queries @ self.embeddings.T
+            exact_rows: _np.ndarray = _np.argsort(-exact_scores, axis=1)[:, :k]
+            _np.testing.assert_array_equal(self.order[rows], exact_rows)
+            _np.testing.assert_allclose(
+                scores,
+                _np.take_along_axis(exact_scores, exact_rows, axis=1),
+                rtol=1e-5,
+            )
+
+        def test_missing_neighbours(
+            self,
+        ) -> None:
+            """
+            Ensure that the slots without a candidate are padded with a similarity of -inf and a row of -1.
+            """
+            # Log the name of the test
+            _logger.info(
+                "Running test: test_missing_neighbours",
+            )
+
+            index, _ = build_index(self.embeddings[:3], n_lists=2)
+            scores, rows = search(index, self.queries, k=5, n_probe=2)
+
+            self.assertEqual(scores.shape, (20, 5))
+            self.assertTrue(_np.isfinite(scores[:, :3]).all())
+            self.assertTrue((rows[:, :3] >= 0).all())
+            self.assertTrue(_np.isneginf(scores[:, 3:]).all())
+            self.assertTrue((rows[:, 3:] == -1).all())
+
+        def test_save_and_load(
+            self,
+        ) -> None:
+            """
+            Ensure that a save/load round trip memory-maps the same vectors and keeps the threshold.
+            """
+            # Log the name of the test
+            _logger.info(
+                "Running test: test_save_and_load",
+            )
+
+            index: EmbeddingIndex = _replace(self.index, threshold=0.5)
+            with _TemporaryDirectory() as directory:
+                save_index(index, _Path(directory))
+                loaded: EmbeddingIndex = load_index(_Path(directory))
+
+                self.assertIsInstance(loaded.vectors, _np.memmap)
+                _np.testing.assert_array_equal(loaded.vectors, index.vectors)
+                _np.testing.assert_array_equal(loaded.centroids, index.centroids)
+                _np.testing.assert_array_equal(loaded.offsets, index.offsets)
+                self.assertAlmostEqual(loaded.threshold, 0.5)  # type: ignore
+                self.assertIsNone(loaded.texts)
+
+        def test_calibrate_threshold(
+            self,
+        ) -> None:
+            """
+            Ensure that at most the requested fraction of the negatives scores above the threshold.
+            """
+            # Log the name of the test
+            _logger.info(
+                "Running test: test_calibrate_threshold",
+            )
+
+            threshold, scores = calibrate_threshold(
+                self.index, self.queries, false_match_rate=0.1
+            )
+
+            self.assertEqual(len(scores), 20)
+            self.assertLessEqual(_np.mean(scores > threshold), 0.1)
+
+        def test_measure(
+            self,
+        ) -> None:
+            """
+            Ensure that exhaustive search has perfect recall, both latencies are reported, and empty queries are rejected.
+            """
+            # Log the name of the test
+            _logger.info(
+                "Running test: test_measure",
+            )
+
+            results: dict[str, float] = measure(
+                self.index,
+                self.order,
+                self.embeddings,
+                self.queries,
+                k=5,
+                n_probe=len(self.index.centroids),
+                max_elements=1000,  # 2 queries per brute-force chunk
+            )
+
+            self.assertEqual(results["recall"], 1.0)
+            self.assertGreater(results["batched_query_latency_ms"], 0.0)
+            self.assertGreater(results["single_query_latency_ms"], 0.0)
+            with self.assertRaises(ValueError):
+                measure(self.index, self.order, self.embeddings, self.queries[:0])
+
+    # Run the tests
+    _unittest.main()
@@ -0,0 +1,522 @@
+"""
+Module: pruning.py
+
+Handles structured pruning of the fine-tuned [DistilBERT](https://huggingface.co/docs/transformers/en/model_doc/distilbert) model.
+
+Attention heads and feed-forward (FFN) neurons are scored with a first-order Taylor estimate of the loss change when removing them ([Michel et al., 2019](https://arxiv.org/abs/1905.10650)), then the least important ones are physically removed from the weight matrices.
+"""
+
+from time import perf_counter as _perf_counter
+from typing import Any as _Any
+
+import numpy as _np
+import torch as _torch
+from loguru import logger as _logger
+from sklearn.metrics import f1_score as _f1_score
+from transformers.pytorch_utils import prune_linear_layer as _prune_linear_layer
+
+# Public objects
+__all__: list[str] = [
+    # VSCode: Sort lines in descending order
+    "count_parameters",
+    "evaluate",
+    "finetune",
+    "measure_latency",
+    "prune",
+    "score_importance",
+]
+
+
+def _layers(
+    model: _Any,
+) -> _Any:
+    """
+    Get the transformer layers of a DistilBERT sequence classification model.
+
+    Args:
+        model (Any): Hugging Face DistilBERT sequence classification model.
+
+    Raises:
+        ValueError: If the model is not a DistilBERT model.
+
+    Returns:
+        ModuleList: Transformer layers of the model.
+    """
+    if model.config.model_type != "distilbert":
+        raise ValueError(
+            f"Only DistilBERT models can be pruned, got '{model.config.model_type}'",
+        )
+    return model.distilbert.transformer.layer
+
+
+def _batches(
+    tokenizer: _Any,
+    texts: list[str],
+    labels: list[int],
+    device: str,
+    batch_size: int,
+):
+    """
+    Tokenize the texts in batches.
+
+    Args:
+        tokenizer (Any): Hugging Face tokenizer matching the model.
+        texts (list[str]): Texts to tokenize.
+        labels (list[int]): Labels of the texts (0 = non-harmful, 1 = harmful).
+        device (str): Device to move the tensors to (e.g., "cuda" or "cpu").
+        batch_size (int): Number of texts per batch.
+
+    Yields:
+        tuple[dict[str, Tensor], Tensor]: Model inputs and labels of each batch.
+    """
+    for start in range(0, len(texts), batch_size):
+        inputs = tokenizer(
+            texts[start : start + batch_size],
+            return_tensors="pt",
+            truncation=True,
+            padding=True,
+        )
+        yield (
+            {k: v.to(device) for k, v in inputs.items()},
+            _torch.tensor(labels[start : start + batch_size], device=device),
+        )
+
+
+def score_importance(
+    model: _Any,
+    tokenizer: _Any,
+    texts: list[str],
+    labels: list[int],
+    device: str,
+    batch_size: int = 32,
+) -> tuple[_np.ndarray, _np.ndarray]:
+    """
+    Score the importance of every attention head and FFN neuron on the given (validation) texts.
+
+    Args:
+        model (Any): Hugging Face DistilBERT sequence classification model.
+        tokenizer (Any): Hugging Face tokenizer matching the model.
+        texts (list[str]): Texts to score the model on.
+        labels (list[int]): Labels of the texts (0 = non-harmful, 1 = harmful).
+        device (str): Device to run the model on (e.g., "cuda" or "cpu").
+        batch_size (int): Number of texts per forward pass.
+
+    Raises:
+        RuntimeError: If the model ignores the head mask (transformers 5.x or a non-eager attention implementation).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Head importance of shape (n_layers, n_heads) and neuron importance of shape (n_layers, hidden_dim).
+    """
+    start: float = _perf_counter()
+    layers = _layers(model)
+    config = model.config
+    model.eval()
+
+    # Multiplying each head by a mask of ones lets the gradient of the mask measure the head's contribution to the loss
+    head_mask: _torch.Tensor = _torch.ones(
+        config.n_layers, config.n_heads, device=device, requires_grad=True
+    )
+    head_importance: _torch.Tensor = _torch.zeros(config.n_layers, config.n_heads)
+    neuron_importance: _torch.Tensor = _torch.zeros(config.n_layers, config.hidden_dim)
+
+    for inputs, batch_labels in _batches(tokenizer, texts, labels, device, batch_size):
+        model.zero_grad()
+        head_mask.grad = None
+        model(**inputs, labels=batch_labels, head_mask=head_mask).loss.backward()
+
+        # Newer transformers (5.x) silently ignore the head mask, so there is nothing to score the heads with
+        if head_mask.grad is None:
+            raise RuntimeError(
+                "The model ignored the head mask, cannot score the attention heads, please install 'transformers<5' and load the model with 'attn_implementation=\"eager\"'",
+            )
+        head_importance += head_mask.grad.abs().detach().cpu()
+        for i, layer in enumerate(layers):
+            # Taylor estimate of removing neuron "f": the weights entering it (lin1 row + bias) and leaving it (lin2 column)
+            lin1, lin2 = layer.ffn.lin1, layer.ffn.lin2
+            contribution: _torch.Tensor = (
+                (lin1.weight * lin1.weight.grad).sum(dim=1)
+                + lin1.bias * lin1.bias.grad
+                + (lin2.weight * lin2.weight.grad).sum(dim=0)
+            )
+            neuron_importance[i] += contribution.abs().detach().cpu()
+    model.zero_grad()
+
+    # Normalize the head importance per layer, so that the layers are comparable
+    head_importance /= head_importance.norm(dim=1, keepdim=True).clamp(min=1e-12)
+
+    _logger.debug(
+        f"Scored the importance of {config.n_layers * config.n_heads} heads and {config.n_layers * config.hidden_dim} neurons, took {round(_perf_counter() - start, 2)}s",
+    )
+    return head_importance.numpy(), neuron_importance.numpy()
+
+
+def prune(
+    model: _Any,
+    head_importance: _np.ndarray,
+    neuron_importance: _np.ndarray,
+    head_fraction: float,
+    neuron_fraction: float,
+) -> None:
+    """
+    Physically remove the least important attention heads and FFN neurons from the model (in-place).
+
+    The heads are ranked across all layers, but at least one head is kept in every layer. The same number of neurons is removed from every layer, because DistilBERT stores a single FFN size ("hidden_dim") in its config, which must match the weights for `from_pretrained` to load them.
+
+    Args:
+        model (Any): Hugging Face DistilBERT sequence classification model, not pruned yet.
+        head_importance (np.ndarray): Head importance of shape (n_layers, n_heads), from `score_importance`.
+        neuron_importance (np.ndarray): Neuron importance of shape (n_layers, hidden_dim), from `score_importance`.
+        head_fraction (float): Fraction of all heads to remove (0.0 - 1.0).
+        neuron_fraction (float): Fraction of the neurons of every layer to remove (0.0 - 1.0).
+
+    Raises:
+        ValueError: If a fraction is not in the [0.0, 1.0) range.
+        RuntimeError: If the model does not support pruning heads (transformers 5.x).
+    """
+    if not hasattr(model, "prune_heads"):
+        raise RuntimeError(
+            "The model does not support pruning heads, please install 'transformers<5'",
+        )
+    for name, fraction in (("head", head_fraction), ("neuron", neuron_fraction)):
+        if not 0.0 <= fraction < 1.0:
+            raise ValueError(
+                f"The {name} fraction must be in the [0.0, 1.0) range: {fraction}",
+            )
+
+    layers = _layers(model)
+    n_layers, n_heads = head_importance.shape
+
+    # Remove the least important heads across all layers, keeping at least one head per layer
+    heads_to_prune: dict[int, list[int]] = {i: [] for i in range(n_layers)}
+    n_to_prune: int = int(round(head_fraction * n_layers * n_heads))
+    for flat in _np.argsort(head_importance, axis=None):
+        if n_to_prune == 0:
+            break
+        layer, head = divmod(int(flat), n_heads)
+        if len(heads_to_prune[layer]) < n_heads - 1:
+            heads_to_prune[layer].append(head)
+            n_to_prune -= 1
+    heads_to_prune = {k: v for k, v in heads_to_prune.items() if v}
+    if heads_to_prune:
+        # Also records the pruned heads in the config, so that `from_pretrained` prunes them again on load
+        model.prune_heads(heads_to_prune)
+
+    # Keep the same number of most important neurons in every layer
+    n_keep: int = neuron_importance.shape[1] - int(
+        round(neuron_fraction * neuron_importance.shape[1])
+    )
+    if n_keep < neuron_importance.shape[1]:
+        for i, layer in enumerate(layers):
+            keep: _torch.Tensor = _torch.from_numpy(
+                _np.sort(_np.argsort(neuron_importance[i])[-n_keep:])
+            ).to(layer.ffn.lin1.weight.device)
+            layer.ffn.lin1 = _prune_linear_layer(layer.ffn.lin1, keep, dim=0)
+            layer.ffn.lin2 = _prune_linear_layer(layer.ffn.lin2, keep, dim=1)
+        model.config.hidden_dim = n_keep
+
+    _logger.debug(
+        f"Pruned {sum(len(v) for v in heads_to_prune.values())} heads and {neuron_importance.shape[1] - n_keep} neurons per layer",
+    )
+
+
+def finetune(
+    model: _Any,
+    tokenizer: _Any,
+    texts: list[str],
+    labels: list[int],
+    device: str,
+    steps: int,
+    batch_size: int = 32,
+    learning_rate: float = 2e-5,
+) -> None:
+    """
+    Briefly fine-tune the (pruned) model to recover accuracy (in-place).
+
+    Args:
+        model (Any): Hugging Face sequence classification model.
+        tokenizer (Any): Hugging Face tokenizer matching the model.
+        texts (list[str]): Texts to train on.
+        labels (list[int]): Labels of the texts (0 = non-harmful, 1 = harmful).
+        device (str): Device to run the model on (e.g., "cuda" or "cpu").
+        steps (int): Number of optimizer steps, cycling through the texts if needed.
+        batch_size (int): Number of texts per step.
+        learning_rate (float): Learning rate of the AdamW optimizer.
+    """
+    start: float = _perf_counter()
+    optimizer = _torch.optim.AdamW(model.parameters(), lr=learning_rate)
+    model.train()
+    step: int = 0
+    while step < steps:
+        for inputs, batch_labels in _batches(
+            tokenizer, texts, labels, device, batch_size
+        ):
+            optimizer.zero_grad()
+            loss: _torch.Tensor = model(**inputs, labels=batch_labels).loss
+            loss.backward()
+            optimizer.step()
+            step += 1
+            _logger.debug(
+                f"Fine-tuning step {step}/{steps}, loss: {round(loss.item(), 4)}",
+            )
+            if step >= steps:
+                break
+    model.eval()
+
+    _logger.debug(
+        f"Fine-tuned the model for {steps} steps, took {round(_perf_counter() - start, 2)}s",
+    )
+
+
+def evaluate(
+    model: _Any,
+    tokenizer: _Any,
+    texts: list[str],
+    labels: list[int],
+    device: str,
+    batch_size: int = 32,
+) -> float:
+    """
+    Compute the binary F1 score of the model.
+
+    Args:
+        model (Any): Hugging Face sequence classification model.
+        tokenizer (Any): Hugging Face tokenizer matching the model.
+        texts (list[str]): Texts to evaluate the model on.
+        labels (list[int]): Labels of the texts (0 = non-harmful, 1 = harmful).
+        device (str): Device to run the model on (e.g., "cuda" or "cpu").
+        batch_size (int): Number of texts per forward pass.
+
+    Returns:
+        float: Binary F1 score (harmful = positive class).
+    """
+    model.eval()
+    predictions: list[int] = []
+    with _torch.no_grad():
+        for inputs, _ in _batches(tokenizer, texts, labels, device, batch_size):
+            predictions.extend(model(**inputs).logits.argmax(dim=-1).tolist())
+    return float(_f1_score(labels, predictions, average="binary"))
+
+
+def measure_latency(
+    model: _Any,
+    tokenizer: _Any,
+    texts: list[str],
+    device: str,
+    warmup: int = 5,
+) -> float:
+    """
+    Measure the mean latency of classifying a single text, as done by "predict.py".
+
+    Args:
+        model (Any): Hugging Face sequence classification model.
+        tokenizer (Any): Hugging Face tokenizer matching the model.
+        texts (list[str]): Texts to classify one by one.
+        device (str): Device to run the model on (e.g., "cuda" or "cpu").
+        warmup (int): Number of texts to classify before measuring.
+
+    Returns:
+        float: Mean latency per text in milliseconds.
+    """
+    model.eval()
+    inputs: list[dict[str, _torch.Tensor]] = [
+        {
+            k: v.to(device)
+            for k, v in tokenizer(text, return_tensors="pt", truncation=True).items()
+        }
+        for text in texts
+    ]
+    with _torch.no_grad():
+        for sample in inputs[:warmup]:
+            model(**sample)
+        if device == "cuda":
+            _torch.cuda.synchronize()
+        start: float = _perf_counter()
+        for sample in inputs:
+            model(**sample)
+        if device == "cuda":
+            _torch.cuda.synchronize()
+    return 1000 * (_perf_counter() - start) / len(inputs)
+
+
+def count_parameters(
+    model: _Any,
+) -> int:
+    """
+    Count the parameters of the model.
+
+    Args:
+        model (Any): Hugging Face model.
+
+    Returns:
+        int: Number of parameters.
+    """
+    return sum(p.numel() for p in model.parameters())
+
+
+# If this file is run directly, run the tests
+if __name__ == "__main__":
+    import sys as _sys
+    import unittest as _unittest
+    from tempfile import TemporaryDirectory as _TemporaryDirectory
+
+    from transformers import DistilBertConfig as _DistilBertConfig
+    from transformers import (
+        DistilBertForSequenceClassification as _DistilBertForSequenceClassification,
+    )
+
+    # Set the log level to INFO (comment out these lines to see DEBUG level messages)
+    _logger.remove()
+    _logger.add(_sys.stdout, level="INFO")
+
+    def _tiny_model() -> _Any:
+        """
+        Create a tiny, randomly initialized DistilBERT (2 layers, 4 heads, 64 FFN neurons).
+        """
+        _torch.manual_seed(42)
+        config = _DistilBertConfig(
+            vocab_size=100,
+            dim=32,
+            n_layers=2,
+            n_heads=4,
+            hidden_dim=64,
+            max_position_embeddings=16,
+            num_labels=2,
+            attn_implementation="eager",
+        )
+        return _DistilBertForSequenceClassification(config).eval()
+
+    def _tiny_tokenizer(
+        texts: list[str],
+        **kwargs: _Any,
+    ) -> dict[str, _torch.Tensor]:
+        """
+        Tokenize the texts as the character codes modulo the vocabulary size (no padding needed, all texts have the same length).
+        """
+        return {
+            "input_ids": _torch.tensor([[ord(c) % 100 for c in text] for text in texts]),
+            "attention_mask": _torch.ones(len(texts), len(texts[0]), dtype=_torch.long),
+        }
+
+    class TestPrune(_unittest.TestCase):
+        def test_score_importance(
+            self,
+        ) -> None:
+            """
+            Ensure that every head and neuron gets a non-negative importance score.
+            """
+            # Log the name of the test
+            _logger.info(
+                "Running test: test_score_importance",
+            )
+
+            head_importance, neuron_importance = score_importance(
+                _tiny_model(),
+                tokenizer=_tiny_tokenizer,
+                texts=["abcdefgh", "hgfedcba", "aaaabbbb", "zyxwvuts"],
+                labels=[0, 1, 0, 1],
+                device="cpu",
+                batch_size=2,
+            )
+
+            self.assertEqual(head_importance.shape, (2, 4))
+            self.assertEqual(neuron_importance.shape, (2, 64))
+            self.assertTrue((head_importance >= 0).all())
+            self.assertTrue((neuron_importance >= 0).all())
+
+        def test_keep_one_head_per_layer(
+            self,
+        ) -> None:
+            """
+            Ensure that a layer whose heads are all the least important keeps one head, and that the least important heads of each layer are the ones removed.
+            """
+            # Log the name of the test
+            _logger.info(
+                "Running test: test_keep_one_head_per_layer",
+            )
+
+            model = _tiny_model()
+            # Layer 0 has the 4 least important heads, in the order 3, 2, 1, 0
+            head_importance: _np.ndarray = _np.array(
+                [[0.4, 0.3, 0.2, 0.1], [0.8, 0.5, 0.7, 0.6]]
+            )
+            prune(
+                model,
+                head_importance=head_importance,
+                neuron_importance=_np.ones((2, 64)),
+                head_fraction=0.75,  # 6 of 8 heads
+                neuron_fraction=0.0,
+            )
+
+            self.assertEqual(
+                {k: sorted(v) for k, v in model.config.pruned_heads.items()},
+                {0: [1, 2, 3], 1: [1, 2, 3]},
+            )
+            for layer in _layers(model):
+                self.assertEqual(layer.attention.n_heads, 1)
+
+        def test_save_and_reload(
+            self,
+        ) -> None:
+            """
+            Ensure that a pruned model is smaller, and that `from_pretrained` reloads it with the same parameters and logits.
+            """
+            # Log the name of the test
+            _logger.info(
+                "Running test: test_save_and_reload",
+            )
+
+            model = _tiny_model()
+            n_parameters: int = count_parameters(model)
+            rng: _np.random.Generator = _np.random.default_rng(42)
+            prune(
+                model,
+                head_importance=rng.random((2, 4)),
+                neuron_importance=rng.random((2, 64)),
+                head_fraction=0.5,
+                neuron_fraction=0.25,
+            )
+
+            # The FFN size in the config must stay in step with the weights of every layer
+            self.assertEqual(model.config.hidden_dim, 48)
+            for layer in _layers(model):
+                self.assertEqual(tuple(layer.ffn.lin1.weight.shape), (48, 32))
+                self.assertEqual(tuple(layer.ffn.lin2.weight.shape), (32, 48))
+            self.assertLess(count_parameters(model), n_parameters)
+
+            inputs: dict[str, _torch.Tensor] = _tiny_tokenizer(["abcdefgh", "hgfedcba"])
+            with _TemporaryDirectory() as directory:
+                model.save_pretrained(directory)
+                reloaded = _DistilBertForSequenceClassification.from_pretrained(
+                    directory
+                ).eval()
+
+            self.assertEqual(count_parameters(reloaded), count_parameters(model))
+            with _torch.no_grad():
+                self.assertTrue(
+                    _torch.allclose(
+                        model(**inputs).logits, reloaded(**inputs).logits, atol=1e-5
+                    )
+                )
+
+        def test_invalid_fraction(
+            self,
+        ) -> None:
+            """
+            Ensure that pruning every neuron is rejected.
+            """
+            # Log the name of the test
+            _logger.info(
+                "Running test: test_invalid_fraction",
+            )
+
+            with self.assertRaises(ValueError):
+                prune(
+                    _tiny_model(),
+                    head_importance=_np.ones((2, 4)),
+                    neuron_importance=_np.ones((2, 64)),
+                    head_fraction=0.0,
+                    neuron_fraction=1.0,
+                )
+
+    # Run the tests
+    _unittest.main()
@@ -1,38 +1,68 @@
 # predict.py
 
 
+import sys
+
 import torch
+from lib import filepaths, index
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
-# Load the tokenizer and model
-tokenizer = AutoTokenizer.from_pretrained("./models")
-model = AutoModelForSequenceClassification.from_pretrained("./models")
+# Load the tokenizer and model (optionally from another directory, e.g., "./models/pruned/50" saved by "prune.py")
+model_directory = sys.argv[1] if len(sys.argv) > 1 else "./models"
+tokenizer = AutoTokenizer.from_pretrained(model_directory)
+model = AutoModelForSequenceClassification.from_pretrained(model_directory)
 
 # Ensure the model uses the GPU if available
 device = "cuda" if torch.cuda.is_available() else "cpu"
 model.to(device)
 
+# Load the index of known-harmful content if it was built (see "build_index.py"), its embeddings only match the default model
+# The lookup is optional, so a missing or broken index only disables it instead of stopping the classifier
+harmful_index = None
+if (filepaths.indexes / "harmful" / "vectors.npy").exists() and len(sys.argv) == 1:
+    try:
+        harmful_index = index.load_index(filepaths.indexes / "harmful")
+    except Exception as e:
+        print(f"Failed to load the index of known-harmful content, continuing without it: {e}")
+
 
 def predict(text):
     # Tokenize the input text
     inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True)
     inputs = {k: v.to(device) for k, v in inputs.items()}
 
-    # Make prediction
+    # Make prediction (the hidden states are reused for the index lookup)
     with torch.no_grad():
-        outputs = model(**inputs)
+        outputs = model(**inputs, output_hidden_states=True)
 
     logits = outputs.logits
     probabilities = torch.nn.functional.softmax(logits, dim=-1)
     confidence, predicted_class = torch.max(probabilities, dim=-1)
 
-    return predicted_class.item(), confidence.item()
+    return predicted_class.item(), confidence.item(), lookup(outputs, inputs)
+
+
+def lookup(outputs, inputs):
+    # Return the most similar known-harmful text and its similarity, or None if there is no close match
+    # The threshold was calibrated on non-harmful texts by "build_index.py", indexes built without one never match
+    if harmful_index is None or harmful_index.threshold is None:
+        return None
+
+    embedding = index.pool(outputs.hidden_states[-1], inputs["attention_mask"])
+    scores, rows = index.search(harmful_index, embedding, k=1)
+    if rows[0, 0] < 0 or scores[0, 0] < harmful_index.threshold:
+        return None
+
+    texts = harmful_index.texts
+    return texts["text"][rows[0, 0]] if texts is not None else None, float(scores[0, 0])
 
 
 while True:
-    prediction, confidence = predict(input("Enter text: "))
+    prediction, confidence, match = predict(input("Enter text: "))
 
     # print(
     #     f"Prediction: {'Hate speech (1)' if prediction == 1 else 'Not hate speech (0)'}"
     # )
     print(f"Confidence: {confidence:.4f}")
+    if match is not None:
+        print(f"Known harmful match ({match[1]:.4f}): {match[0]}")
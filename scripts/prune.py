@@ -0,0 +1,141 @@
+"""
+Script: prune.py
+
+Prunes the attention heads and feed-forward (FFN) neurons of the fine-tuned DistilBERT saved by "train.py", then saves a smaller model per pruning level into the "models/pruned" directory, loadable by "predict.py".
+
+The importance of each head and neuron is scored on one half of a validation split of BAN-PL_1 that excludes the rows used by "train.py" for training, and the F1 score is evaluated on the other half. The pruned models are optionally fine-tuned briefly on those training rows to recover accuracy. Finally, a latency/F1 trade-off table is reported for every pruning level.
+
+**Note**: Before running this script, make sure to run 'prepare_datasets.py' and 'train.py'.
+"""
+
+import pandas
+import torch
+from lib import arguments, filepaths, pruning, utils
+from loguru import logger
+from sklearn.model_selection import train_test_split
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+# Number of evaluation texts classified one by one to measure the latency
+LATENCY_SAMPLES: int = 100
+
+
+@logger.catch  # Add pretty exceptions
+def main() -> None:
+    # Get the command line arguments
+    args = arguments.get_prune_arguments()
+
+    # Initialize logger with a timestamped log file
+    utils.create_timestamped_log_file(__file__, filepaths.logs)
+
+    # Reproduce the split of "train.py", then validate on rows it did not train on
+    df: pandas.DataFrame = pandas.read_csv(filepaths.datasets / "BAN-PL_1.csv")  # type: ignore
+    train_df, _ = train_test_split(
+        df.sample(frac=0.01, random_state=42), test_size=0.2, random_state=42
+    )
+    train_df = train_df.dropna(subset=["text"])  # type: ignore
+    validation_df: pandas.DataFrame = df.drop(train_df.index).dropna(subset=["text"])  # type: ignore
+    validation_df = validation_df.sample(
+        n=min(args.samples, len(validation_df)), random_state=42
+    )
+
+    # Score the importance on one half and evaluate on the other, so that the F1 is not graded on the rows that chose what survives
+    scoring_df, evaluation_df = train_test_split(
+        validation_df, test_size=0.5, random_state=42
+    )
+    scoring_texts: list[str] = scoring_df["text"].tolist()
+    scoring_labels: list[int] = scoring_df["labels"].astype(int).tolist()
+    evaluation_texts: list[str] = evaluation_df["text"].tolist()
+    evaluation_labels: list[int] = evaluation_df["labels"].astype(int).tolist()
+    logger.info(
+        f"Using {len(scoring_df)} scoring texts, {len(evaluation_df)} evaluation texts and {len(train_df)} training texts",
+    )
+
+    # Load the fine-tuned tokenizer and model (eager attention supports the head mask used for scoring)
+    device: str = "cuda" if torch.cuda.is_available() else "cpu"
+    tokenizer = AutoTokenizer.from_pretrained(filepaths.models)
+
+    def load_model():
+        return AutoModelForSequenceClassification.from_pretrained(
+            filepaths.models, attn_implementation="eager"
+        ).to(device)
+
+    # Score the importance of every head and neuron once, on the unpruned model
+    logger.info("Scoring the importance of the heads and neurons...")
+    head_importance, neuron_importance = pruning.score_importance(
+        load_model(),
+        tokenizer=tokenizer,
+        texts=scoring_texts,
+        labels=scoring_labels,
+        device=device,
+    )
+
+    # Prune, (optionally) fine-tune, evaluate and save the model at every level
+    rows: list[dict[str, float]] = []
+    for level in sorted(args.levels):
+        logger.info(f"Pruning {round(level * 100)}% of the heads and neurons...")
+        model = load_model()
+        pruning.prune(
+            model,
+            head_importance=head_importance,
+            neuron_importance=neuron_importance,
+            head_fraction=level,
+            neuron_fraction=level,
+        )
+        if args.finetune_steps and level > 0:
+            pruning.finetune(
+                model,
+                tokenizer=tokenizer,
+                texts=train_df["text"].tolist(),
+                labels=train_df["labels"].astype(int).tolist(),
+                device=device,
+                steps=args.finetune_steps,
+            )
+
+        rows.append(
+            {
+                "level": level,
+                "parameters_m": pruning.count_parameters(model) / 1e6,
+                "latency_ms": pruning.measure_latency(
+                    model,
+                    tokenizer=tokenizer,
+                    texts=evaluation_texts[:LATENCY_SAMPLES],
+                    device=device,
+                ),
+                "f1": pruning.evaluate(
+                    model,
+                    tokenizer=tokenizer,
+                    texts=evaluation_texts,
+                    labels=evaluation_labels,
+                    device=device,
+                ),
+            }
+        )
+
+        # Save the pruned model with its tokenizer, so that the directory is self-contained
+        output_directory = filepaths.models / "pruned" / f"{round(level * 100)}"
+        model.save_pretrained(output_directory)
+        tokenizer.save_pretrained(output_directory)
+        logger.info(f"Saved the pruned model to '{output_directory}'")
+
+    # Report the latency/F1 trade-off table
+    table: pandas.DataFrame = pandas.DataFrame(rows).round(4)
+    logger.info(f"Latency/F1 trade-off:\n{table.to_string(index=False)}")
+
+    # Recommend the most accurate level within the latency budget
+    if args.max_latency is not None:
+        within_budget: pandas.DataFrame = table[table["latency_ms"] <= args.max_latency]
+        if within_budget.empty:
+            logger.warning(
+                f"No pruning level meets the latency budget of {args.max_latency}ms",
+            )
+        else:
+            best = within_budget.loc[within_budget["f1"].idxmax()]
+            logger.info(
+                f"Most accurate level within {args.max_latency}ms: '{filepaths.models / 'pruned' / str(round(best['level'] * 100))}' (F1 {best['f1']}, {best['latency_ms']}ms)",
+            )
+
+    logger.success("All tasks successfully completed")
+
+
+if __name__ == "__main__":
+    main()